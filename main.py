@@ -1,14 +1,27 @@
-import json
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Set, Tuple, Union
 
+import orjson
 from apscheduler.schedulers.background import BackgroundScheduler
-from fastapi import BackgroundTasks, FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 CACHE_DIR = Path("cache")
+SNAPSHOT_PATH = CACHE_DIR / "all_skins.json"
+INDEX_BY_ID_PATH = CACHE_DIR / "index_by_id.json"
+INDEX_BY_NAME_PATH = CACHE_DIR / "index_by_name.json"
+SKINS_MEMO_TTL_SECONDS = 60
+SKINS_MAX_AGE_SECONDS = 60  # Cache-Control max-age for /skins
 
 # Global state for cache refresh
 cache_status = {
@@ -18,53 +31,347 @@ cache_status = {
 }
 
 
+# In-memory copy of the cached skins, reused while the cache files are unchanged.
+# The snapshot holds the parsed list plus its serialized JSON body and ETag.
+_SKINS_CACHE = {"mtime": 0, "snapshot": None, "expires": 0}
+_SKINS_CACHE_LOCK = threading.Lock()
+
+# Per-hero files already parsed, by name: ((mtime, size), payload)
+_SEEN_HERO_FILES: Dict[str, Tuple[Tuple[float, int], List[dict]]] = {}
+
+
+def _scan_hero_files() -> List[os.DirEntry]:
+    """Per-hero skin cache files, listed in a single directory pass"""
+    with os.scandir(CACHE_DIR) as it:
+        return [
+            e for e in it if e.name.startswith("skins_") and e.name.endswith(".json")
+        ]
+
+
+def _skins_cache_mtime() -> float:
+    """Modification time of the snapshot, or of the newest per-hero file"""
+    try:
+        return SNAPSHOT_PATH.stat().st_mtime
+    except FileNotFoundError:
+        return max((e.stat().st_mtime for e in _scan_hero_files()), default=0)
+
+
+def _skins_cache_fresh(mtime: float) -> bool:
+    return (
+        _SKINS_CACHE["snapshot"] is not None
+        and time.time() < _SKINS_CACHE["expires"]
+        and _SKINS_CACHE["mtime"] == mtime
+    )
+
+
+def _make_snapshot(all_skins: List[dict], body: Union[bytes, memoryview]) -> dict:
+    return {
+        "data": all_skins,
+        "body": body,
+        "etag": f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"',
+    }
+
+
+def load_skins_snapshot() -> Optional[dict]:
+    """Skins with their JSON body, served from memory while the files are unchanged"""
+    if not CACHE_DIR.exists():
+        return None
+
+    mtime = _skins_cache_mtime()
+    if _skins_cache_fresh(mtime):
+        return _SKINS_CACHE["snapshot"]
+
+    with _SKINS_CACHE_LOCK:
+        # Another request may have reloaded while we waited for the lock
+        if _skins_cache_fresh(mtime):
+            return _SKINS_CACHE["snapshot"]
+
+        # Expired but the files are unchanged: keep serving the same snapshot
+        if _SKINS_CACHE["snapshot"] is not None and _SKINS_CACHE["mtime"] == mtime:
+            _SKINS_CACHE["expires"] = time.time() + SKINS_MEMO_TTL_SECONDS
+            return _SKINS_CACHE["snapshot"]
+
+        snapshot = _make_snapshot(*_read_skin_files())
+        _SKINS_CACHE.update(
+            mtime=mtime,
+            snapshot=snapshot,
+            expires=time.time() + SKINS_MEMO_TTL_SECONDS,
+        )
+
+    return snapshot
+
+
 def load_all_skins() -> List[dict]:
-    """Load all skins from cache files"""
+    """Load all skins, served from memory while the cache files are unchanged"""
+    snapshot = load_skins_snapshot()
+    return snapshot["data"] if snapshot else []
+
+
+def _read_skin_files() -> Tuple[List[dict], Union[bytes, memoryview]]:
+    """Load all skins and their JSON body from the snapshot, or the per-hero files"""
+    try:
+        if os.name == "nt":
+            # Windows refuses to replace a file that is still mapped, which
+            # would break the next refresh's write of the snapshot
+            body = SNAPSHOT_PATH.read_bytes()
+        else:
+            with SNAPSHOT_PATH.open("rb") as f:
+                # Map the snapshot rather than copying it into a bytes object.
+                # On POSIX the mapping stays valid after the file is closed or
+                # replaced, and is parsed and served as the /skins body as is.
+                body = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        return orjson.loads(body), body
+    except (FileNotFoundError, ValueError):
+        # ValueError covers an empty snapshot (can't be mapped) and invalid JSON
+        pass
+
     all_skins = []
+    seen = {}
+    for entry in _scan_hero_files():
+        st = entry.stat()
+        fingerprint = (st.st_mtime, st.st_size)
 
-    if not CACHE_DIR.exists():
-        return all_skins
+        # Only open files that changed since we last parsed them
+        cached = _SEEN_HERO_FILES.get(entry.name)
+        if cached is None or cached[0] != fingerprint:
+            try:
+                with open(entry.path, "rb") as f:
+                    data = orjson.loads(f.read())
+                cached = (fingerprint, data.get("payload", []))
+            except (orjson.JSONDecodeError, KeyError):
+                continue
 
-    for cache_file in CACHE_DIR.glob("skins_*.json"):
-        try:
-            with cache_file.open("r", encoding="utf-8") as f:
-                data = json.load(f)
-                payload = data.get("payload", [])
-                all_skins.extend(payload)
-        except (json.JSONDecodeError, KeyError):
-            continue
+        seen[entry.name] = cached
+        all_skins.extend(cached[1])
 
-    return all_skins
+    _SEEN_HERO_FILES.clear()
+    _SEEN_HERO_FILES.update(seen)
 
+    return all_skins, orjson.dumps(all_skins)
 
-def refresh_cache_background():
-    """Refresh cache in background"""
-    global cache_status
 
-    if cache_status["is_refreshing"]:
-        print("Cache refresh already in progress, skipping...")
+def _index_skins(all_skins: List[dict]):
+    """Index skins by skin id and by lowercased character name"""
+    by_id: Dict[str, dict] = {}
+    by_name: Dict[str, List[dict]] = {}
+
+    for skin in all_skins:
+        by_id.setdefault(str(skin.get("skinid")), skin)
+        by_name.setdefault(skin.get("name", "").lower(), []).append(skin)
+
+    return by_id, by_name
+
+
+def _write_atomic(path: Path, data) -> bytes:
+    """Write JSON so readers only ever see the old or the new file"""
+    body = orjson.dumps(data)
+    # A temp name of our own, so concurrent writers (other workers) never
+    # truncate or publish each other's half-written file
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f"{path.stem}.", suffix=".tmp", delete=False
+    ) as tmp:
+        tmp.write(body)
+    try:
+        os.replace(tmp.name, path)
+    except OSError:
+        os.unlink(tmp.name)
+        raise
+    return body
+
+
+def build_indexes(all_skins: List[dict]):
+    """Write the id and character name indexes for the given skins"""
+    by_id, by_name = _index_skins(all_skins)
+
+    _write_atomic(INDEX_BY_ID_PATH, by_id)
+    _write_atomic(INDEX_BY_NAME_PATH, by_name)
+    return by_id, by_name
+
+
+# Lookup indexes, reloaded when the index files change
+INDEX_BY_ID: Dict[str, dict] = {}
+INDEX_BY_NAME: Dict[str, List[dict]] = {}
+# (lowercased skin name, skin) pairs for substring search, together with an
+# inverted index of trigram -> positions of the names containing it. Kept in
+# one tuple so a reload swaps both at once.
+SKIN_NAME_INDEX: Tuple[List[Tuple[str, dict]], Dict[str, Set[int]]] = ([], {})
+_INDEX_CACHE = {"mtime": 0, "expires": 0}
+_INDEX_CACHE_LOCK = threading.Lock()
+
+
+def _index_mtime() -> float:
+    try:
+        return max(INDEX_BY_ID_PATH.stat().st_mtime, INDEX_BY_NAME_PATH.stat().st_mtime)
+    except FileNotFoundError:
+        return 0
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def _index_trigrams(names: List[Tuple[str, dict]]) -> Dict[str, Set[int]]:
+    """Build an inverted index of name trigrams for substring search"""
+    index: Dict[str, Set[int]] = {}
+
+    for pos, (name, _) in enumerate(names):
+        for gram in _trigrams(name):
+            index.setdefault(gram, set()).add(pos)
+
+    return index
+
+
+def _search_skin_names(query: str) -> List[dict]:
+    """Skins whose lowercased name contains the lowercased query"""
+    names, trigrams = SKIN_NAME_INDEX
+
+    if len(query) < 3:
+        # Too short to have a trigram, fall back to a scan
+        return [skin for name, skin in names if query in name]
+
+    # Every name containing the query contains all of its trigrams
+    postings = sorted((trigrams.get(gram, set()) for gram in _trigrams(query)), key=len)
+    candidates = set.intersection(*postings)
+
+    return [names[pos][1] for pos in sorted(candidates) if query in names[pos][0]]
+
+
+def _index_cache_fresh(mtime: float) -> bool:
+    return time.time() < _INDEX_CACHE["expires"] and _INDEX_CACHE["mtime"] == mtime
+
+
+def load_indexes() -> None:
+    """Make sure the lookup indexes reflect the files on disk"""
+    mtime = _index_mtime()
+    if _index_cache_fresh(mtime):
         return
 
+    with _INDEX_CACHE_LOCK:
+        if _index_cache_fresh(mtime):
+            return
+
+        # Expired but the index files are unchanged, nothing to reload
+        if mtime and _INDEX_CACHE["mtime"] == mtime:
+            _INDEX_CACHE["expires"] = time.time() + SKINS_MEMO_TTL_SECONDS
+            return
+
+        try:
+            with INDEX_BY_ID_PATH.open("rb") as f:
+                by_id = orjson.loads(f.read())
+            with INDEX_BY_NAME_PATH.open("rb") as f:
+                by_name = orjson.loads(f.read())
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            # No index written yet, build one in memory from the skin cache
+            by_id, by_name = _index_skins(load_all_skins())
+            mtime = 0
+
+        _set_indexes(by_id, by_name, mtime)
+
+
+def _set_indexes(
+    by_id: Dict[str, dict], by_name: Dict[str, List[dict]], mtime: float
+) -> None:
+    """Swap in new lookup indexes, the caller holds _INDEX_CACHE_LOCK"""
+    global INDEX_BY_ID, INDEX_BY_NAME, SKIN_NAME_INDEX
+
+    # Lowercase skin names once per reload instead of on every search
+    names = [
+        (skin.get("skin_name", "").lower(), skin)
+        for skins in by_name.values()
+        for skin in skins
+    ]
+    SKIN_NAME_INDEX = (names, _index_trigrams(names))
+    INDEX_BY_ID, INDEX_BY_NAME = by_id, by_name
+    _INDEX_CACHE.update(mtime=mtime, expires=time.time() + SKINS_MEMO_TTL_SECONDS)
+
+
+def _publish_refresh(all_skins: List[dict], body: bytes, by_id, by_name) -> None:
+    """Serve freshly scraped skins from memory instead of re-reading the files"""
+    with _SKINS_CACHE_LOCK:
+        _SKINS_CACHE.update(
+            mtime=_skins_cache_mtime(),
+            snapshot=_make_snapshot(all_skins, body),
+            expires=time.time() + SKINS_MEMO_TTL_SECONDS,
+        )
+
+    with _INDEX_CACHE_LOCK:
+        _set_indexes(by_id, by_name, _index_mtime())
+
+
+# Single-flight refresh: at most one refresh runs, later callers share its future
+_REFRESH_EXECUTOR = ThreadPoolExecutor(max_workers=1)
+_REFRESH_FUTURE: Optional[Future] = None
+_REFRESH_LOCK = threading.Lock()
+
+
+def _start_refresh() -> Tuple[Future, bool]:
+    """Start a refresh unless one is running; return its future and if it is new"""
+    global _REFRESH_FUTURE
+
+    with _REFRESH_LOCK:
+        if _REFRESH_FUTURE is not None and not _REFRESH_FUTURE.done():
+            print("Cache refresh already in progress, joining it...")
+            return _REFRESH_FUTURE, False
+
+        cache_status["is_refreshing"] = True
+        _REFRESH_FUTURE = _REFRESH_EXECUTOR.submit(_refresh_cache)
+        return _REFRESH_FUTURE, True
+
+
+def refresh_cache_background() -> Future:
+    """Refresh cache in background, or join the refresh already running"""
+    future, _ = _start_refresh()
+    return future
+
+
+def _refresh_cache():
+    """Scrape all heroes and publish the skin snapshot and indexes"""
+    global cache_status
+
     try:
         cache_status["is_refreshing"] = True
         print(f"Starting cache refresh at {datetime.now()}")
 
         # Import here to avoid circular imports
-        from your_scraper_file import get_hero_skins, get_heroes
+        from scraper import (
+            HERO_WORKERS,
+            cache,
+            get_hero_skins,
+            get_heroes,
+            parse_pool,
+            reset_skin_fetches,
+            serialize_skins,
+        )
 
         heroes = get_heroes()
         cache_status["progress"]["total"] = len(heroes)
 
-        for i, hero in enumerate(heroes):
-            cache_status["progress"]["current"] = i + 1
-            print(f"Processing {i + 1}/{len(heroes)}: {hero.name}")
-            get_hero_skins(hero)  # This will cache the skins
+        # Scrape heroes concurrently; outbound requests are bounded in scraper.
+        # The parse pool lives only for this refresh and is shut down after it.
+        with parse_pool(), ThreadPoolExecutor(max_workers=HERO_WORKERS) as ex:
+            futures = {ex.submit(get_hero_skins, hero): hero for hero in heroes}
+
+            for i, future in enumerate(as_completed(futures)):
+                future.result()  # This will cache the skins
+                cache_status["progress"]["current"] = i + 1
+                print(f"Processed {i + 1}/{len(heroes)}: {futures[future].name}")
+
+        # Publish everything as one snapshot so readers open a single file
+        all_skins = [
+            skin for future in futures for skin in serialize_skins(future.result())
+        ]
+        body = _write_atomic(SNAPSHOT_PATH, all_skins)
+        by_id, by_name = build_indexes(all_skins)
+        _publish_refresh(all_skins, body, by_id, by_name)
 
         cache_status["last_refresh"] = datetime.now().isoformat()
         print(f"Cache refresh completed at {datetime.now()}")
     except Exception as e:
         print(f"Error during cache refresh: {e}")
     finally:
+        # Write out the heroes that finished, even if another one failed
+        cache.flush_all()
+        reset_skin_fetches()
         cache_status["is_refreshing"] = False
         cache_status["progress"] = {"current": 0, "total": 0}
 
@@ -91,7 +398,7 @@ async def startup_event():
     # Optional: Do an initial refresh on startup if cache is empty
     if not load_all_skins():
         print("Cache is empty, doing initial refresh...")
-        refresh_cache_background()
+        refresh_cache_background().result()
 
 
 @app.on_event("shutdown")
@@ -106,30 +413,51 @@ def health():
     return {"ok": True}
 
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against our ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+
+    return False
+
+
 @app.get("/skins")
-def get_all_skins():
+def get_all_skins(request: Request):
     """Get all skins from cache"""
-    skins = load_all_skins()
+    snapshot = load_skins_snapshot()
 
-    if not skins:
+    if not snapshot or not snapshot["data"]:
         return {
             "message": "No skins in cache. Trigger /refresh to populate cache.",
             "skins": [],
         }
 
-    return skins
+    # The body is serialized once per cache reload and sent as-is
+    headers = {
+        "Cache-Control": f"public, max-age={SKINS_MAX_AGE_SECONDS}",
+        "ETag": snapshot["etag"],
+    }
+    if _etag_matches(request.headers.get("if-none-match"), snapshot["etag"]):
+        return Response(status_code=304, headers=headers)
+
+    return Response(
+        content=snapshot["body"], media_type="application/json", headers=headers
+    )
 
 
 @app.post("/refresh")
-def trigger_refresh(background_tasks: BackgroundTasks):
+def trigger_refresh():
     """Trigger cache refresh manually"""
-    global cache_status
+    _, started = _start_refresh()
 
-    if cache_status["is_refreshing"]:
+    if not started:
         return {"message": "Cache refresh already in progress", "status": cache_status}
 
-    background_tasks.add_task(refresh_cache_background)
-
     return {
         "message": "Cache refresh started in background",
         "status": "Check /refresh/status for progress",
@@ -150,12 +478,8 @@ def get_refresh_status():
 @app.get("/character/{character_name}")
 def get_character_skins(character_name: str):
     """Get all skins for a specific character"""
-    all_skins = load_all_skins()
-    character_skins = [
-        skin
-        for skin in all_skins
-        if skin.get("name", "").lower() == character_name.lower()
-    ]
+    load_indexes()
+    character_skins = INDEX_BY_NAME.get(character_name.lower())
 
     if not character_skins:
         raise HTTPException(
@@ -168,25 +492,20 @@ def get_character_skins(character_name: str):
 @app.get("/skin/{skin_id}")
 def get_skin_by_id(skin_id: int):
     """Get skin details by skin ID"""
-    all_skins = load_all_skins()
+    load_indexes()
+    skin = INDEX_BY_ID.get(str(skin_id))
 
-    for skin in all_skins:
-        if skin.get("skinid") == skin_id:
-            return skin
+    if skin is None:
+        raise HTTPException(status_code=404, detail=f"Skin with ID {skin_id} not found")
 
-    raise HTTPException(status_code=404, detail=f"Skin with ID {skin_id} not found")
+    return skin
 
 
 @app.get("/skin/name/{skin_name}")
 def get_skin_by_name(skin_name: str):
     """Get skin details by skin name"""
-    all_skins = load_all_skins()
-
-    matching_skins = [
-        skin
-        for skin in all_skins
-        if skin_name.lower() in skin.get("skin_name", "").lower()
-    ]
+    load_indexes()
+    matching_skins = _search_skin_names(skin_name.lower())
 
     if not matching_skins:
         raise HTTPException(
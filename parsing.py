@@ -0,0 +1,46 @@
+from typing import Optional
+
+import soupsieve as sv
+from bs4 import BeautifulSoup
+
+# Kept free of import-time side effects: parse worker processes import this
+# module to run parse_skin_page.
+
+# CSS selectors for the wiki markup, compiled once at import
+HERO_LINK_SELECTOR = sv.compile(".herocard-link a")
+TAB_CONTENT_SELECTOR = sv.compile(".wds-tab__content")
+SKIN_LINK_SELECTOR = sv.compile(".charcat-wrapper a[href^='/wiki/']")
+SKIN_TABLE_SELECTOR = sv.compile(
+    "table.char-table-chronology, table.char-table-epic, "
+    "table.char-table-legendary, table.char-table-rare"
+)
+_TR = sv.compile("tr")
+_TH = sv.compile("th")
+_TD = sv.compile("td")
+
+# Header labels of the skin id row in the character table
+_ID_LABELS = frozenset({"ID NO.", "ID_NO."})
+
+
+def extract_skin_id(soup) -> Optional[str]:
+    """Extract skin ID from the character table"""
+    # Look for tables with character info
+    for table in SKIN_TABLE_SELECTOR.select(soup):
+        # Find all rows in the table
+        for row in _TR.select(table):
+            # Look for a <th> reading "ID NO."
+            for th in _TH.select(row):
+                if th.get_text(strip=True) in _ID_LABELS:
+                    # Found the ID row - now get the td in the same row
+                    for td in _TD.select(row):
+                        text = td.get_text(strip=True)
+                        # Make sure it's a valid ID (7-8 digits typically)
+                        if text.isdigit() and len(text) >= 6:
+                            return str(text)
+
+    return None
+
+
+def parse_skin_page(html: str) -> Optional[str]:
+    """Parse a skin page and extract its skin id"""
+    return extract_skin_id(BeautifulSoup(html, "lxml"))
@@ -1,18 +1,44 @@
-import json
+import atexit
+import multiprocessing
+import os
+import threading
 import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional
 from urllib.parse import urljoin
 
-import requests
+import orjson
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from requests_cache import CachedSession
+from urllib3.util.retry import Retry
+
+from parsing import (
+    HERO_LINK_SELECTOR,
+    SKIN_LINK_SELECTOR,
+    TAB_CONTENT_SELECTOR,
+    parse_skin_page,
+)
 
 BASE = "https://marvelrivals.fandom.com/wiki"
 HEROES_URL = f"{BASE}/Heroes"
 
 CACHE_DIR = Path("cache")
 CACHE_TTL_SECONDS = 2 * 60 * 60  # 2 hours
+CACHE_FLUSH_INTERVAL_SECONDS = 5
+# HTTP responses are kept this long and revalidated with ETag/Last-Modified
+HTTP_CACHE_EXPIRE_SECONDS = 7 * 24 * 60 * 60  # 7 days
+
+# Number of skin pages fetched concurrently (shared by all heroes)
+FETCH_WORKERS = 16
+# Number of heroes scraped concurrently during a refresh
+HERO_WORKERS = 8
+# Upper bound on in-flight requests to the wiki across all threads
+MAX_CONCURRENT_REQUESTS = 20
 
 
 HEADERS = {
@@ -26,14 +52,44 @@ HEADERS = {
     "Referer": "https://marvelrivals.fandom.com/",
 }
 
-@dataclass
+# Shared session so worker threads reuse pooled connections. Responses are
+# cached on disk, and unchanged pages come back as 304 on conditional requests.
+CACHE_DIR.mkdir(exist_ok=True)
+_SESSION = CachedSession(
+    str(CACHE_DIR / "http_cache.sqlite"),
+    expire_after=HTTP_CACHE_EXPIRE_SECONDS,
+    cache_control=True,
+)
+_SESSION.headers.update(HEADERS)
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=32,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+        ),
+    ),
+)
+_REQUEST_SLOTS = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+
+# Skin page pool shared across heroes so concurrent heroes don't multiply threads
+_FETCH_POOL = ThreadPoolExecutor(max_workers=FETCH_WORKERS)
+# Skin pages are parsed in worker processes while a parse_pool() block is
+# active, so parsing isn't serialized by the GIL
+_PARSE_POOL: Optional[ProcessPoolExecutor] = None
+
+
+@dataclass(slots=True)
 class Hero:
     name: str
     url: str
     id: Optional[str]
 
 
-@dataclass
+@dataclass(slots=True)
 class HeroSkin:
     base_hero: Hero
     name: str
@@ -41,25 +97,36 @@ class HeroSkin:
     id: Optional[str]
 
 
-def get_soup(url: str) -> BeautifulSoup:
-    
-    r = requests.get(
-        url,
-        headers=HEADERS,
-        timeout=10,
-    )
+def fetch_text(url: str) -> str:
+    with _REQUEST_SLOTS:
+        r = _SESSION.get(url, timeout=10)
     r.raise_for_status()
-    return BeautifulSoup(r.text, "html.parser")
+    return r.text
+
+
+def get_soup(url: str) -> BeautifulSoup:
+    return BeautifulSoup(fetch_text(url), "lxml")
 
 
 class Cache:
     """Simple file-based cache with TTL"""
 
-    def __init__(self, cache_dir: Path = CACHE_DIR, ttl: int = CACHE_TTL_SECONDS):
+    def __init__(
+        self,
+        cache_dir: Path = CACHE_DIR,
+        ttl: int = CACHE_TTL_SECONDS,
+        flush_interval: float = CACHE_FLUSH_INTERVAL_SECONDS,
+    ):
         self.cache_dir = cache_dir
         self.ttl = ttl
+        self.flush_interval = flush_interval
         self.cache_dir.mkdir(exist_ok=True)
 
+        # Writes are buffered here and flushed to disk in batches
+        self._pending: Dict[str, dict] = {}
+        self._last_flush = time.time()
+        self._lock = threading.Lock()
+
     def _get_path(self, key: str) -> Path:
         """Convert cache key to safe filename"""
         safe_key = "".join(c if c.isalnum() else "_" for c in key)
@@ -67,42 +134,62 @@ class Cache:
 
     def get(self, key: str) -> Optional[dict]:
         """Get cached data if valid, else None"""
-        path = self._get_path(key)
+        with self._lock:
+            data = self._pending.get(key)
 
-        if not path.exists():
-            return None
+        if data is None:
+            path = self._get_path(key)
 
-        try:
-            with path.open("r", encoding="utf-8") as f:
-                data = json.load(f)
+            if not path.exists():
+                return None
 
-            # Check if cache is still valid
-            age = time.time() - data.get("timestamp", 0)
-            if age >= self.ttl:
+            try:
+                with path.open("rb") as f:
+                    data = orjson.loads(f.read())
+            except orjson.JSONDecodeError:
                 return None
 
-            return data.get("payload")
-        except (json.JSONDecodeError, KeyError):
+        # Check if cache is still valid
+        age = time.time() - data.get("timestamp", 0)
+        if age >= self.ttl:
             return None
 
+        return data.get("payload")
+
     def set(self, key: str, payload: dict) -> None:
-        """Save data to cache"""
-        path = self._get_path(key)
+        """Save data to cache, written to disk on the next flush"""
         data = {"timestamp": time.time(), "payload": payload}
 
-        with path.open("w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+        with self._lock:
+            self._pending[key] = data
+
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if time.time() - self._last_flush > self.flush_interval:
+            self.flush_all()
+
+    def flush_all(self) -> None:
+        """Write all pending entries to disk"""
+        with self._lock:
+            for key, data in self._pending.items():
+                with self._get_path(key).open("wb") as f:
+                    f.write(orjson.dumps(data))
+
+            self._pending.clear()
+            self._last_flush = time.time()
 
 
 # Global cache instance
 cache = Cache()
+atexit.register(cache.flush_all)
 
 
 def fetch_heroes() -> List[Hero]:
     soup = get_soup(HEROES_URL)
     heroes: List[Hero] = []
 
-    for a in soup.select(".herocard-link a"):
+    for a in HERO_LINK_SELECTOR.select(soup):
         name = a.get_text(strip=True)
         href = urljoin(BASE, a["href"])
         heroes.append(Hero(name=name, url=href, id=None))
@@ -121,32 +208,81 @@ def get_heroes() -> List[Hero]:
     return heroes
 
 
-def extract_skin_id(soup) -> Optional[str]:
-    """Extract skin ID from the character table"""
-    # Look for tables with character info
-    tables = soup.select(
-        "table.char-table-chronology, table.char-table-epic, table.char-table-legendary, table.char-table-rare"
-    )
+def _parse_context():
+    """Start method for parse workers that never forks the threaded server"""
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+
+    ctx = multiprocessing.get_context("forkserver")
+    # Import the parser once in the forkserver instead of in every worker.
+    # Workers still re-import the parent's __main__ as __mp_main__, so only
+    # start the pool from the server, where __main__ is uvicorn, not scraper.py.
+    ctx.set_forkserver_preload(["parsing"])
+    return ctx
+
 
-    for table in tables:
-        # Find all rows in the table
-        rows = table.select("tr")
+@contextmanager
+def parse_pool():
+    """Parse skin pages in worker processes for the duration of the block"""
+    global _PARSE_POOL
 
-        for row in rows:
-            # Look for a <th> containing "ID NO."
-            th_elements = row.select("th")
-            for th in th_elements:
-                th_text = th.get_text(strip=True)
-                if "ID NO." in th_text or "ID_NO." in th_text or th_text == "ID NO.":
-                    # Found the ID row - now get the td in the same row
-                    td_elements = row.select("td")
-                    for td in td_elements:
-                        text = td.get_text(strip=True)
-                        # Make sure it's a valid ID (7-8 digits typically)
-                        if text.isdigit() and len(text) >= 6:
-                            return str(text)
+    with ProcessPoolExecutor(
+        max_workers=os.cpu_count(), mp_context=_parse_context()
+    ) as pool:
+        _PARSE_POOL = pool
+        try:
+            yield pool
+        finally:
+            _PARSE_POOL = None
+
+
+def _parse_skin_id(html: str) -> Optional[str]:
+    """Parse a skin page in the parse pool, or in this thread without one"""
+    global _PARSE_POOL
+
+    pool = _PARSE_POOL
+    if pool is not None:
+        try:
+            return pool.submit(parse_skin_page, html).result()
+        except BrokenProcessPool:
+            # A worker died; parse in-thread for the rest of this block
+            if _PARSE_POOL is pool:
+                print("Parse pool broke, parsing skin pages in-thread")
+                _PARSE_POOL = None
+
+    return parse_skin_page(html)
+
+
+def _fetch_skin_id(link) -> Optional[str]:
+    """Follow a skin link and extract its skin id"""
+    name, href = link
+    try:
+        return _parse_skin_id(fetch_text(href))
+    except Exception as e:
+        print(f"Error fetching skin page for {name}: {e}")
+        return None
+
+
+# Skin page fetches by url, shared across heroes so pages that appear on several
+# hero pages are only fetched once per refresh
+_INFLIGHT: Dict[str, Future] = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+
+def _skin_id_future(link) -> Future:
+    """Future for a skin link's id, reusing any fetch already started for its url"""
+    _, href = link
+    with _INFLIGHT_LOCK:
+        future = _INFLIGHT.get(href)
+        if future is None:
+            future = _INFLIGHT[href] = _FETCH_POOL.submit(_fetch_skin_id, link)
+    return future
 
-    return None
+
+def reset_skin_fetches() -> None:
+    """Forget fetched skin pages so the next refresh fetches them again"""
+    with _INFLIGHT_LOCK:
+        _INFLIGHT.clear()
 
 
 def fetch_hero_skins(hero: Hero) -> List[HeroSkin]:
@@ -155,10 +291,13 @@ def fetch_hero_skins(hero: Hero) -> List[HeroSkin]:
     skins: List[HeroSkin] = []
 
     # Find all tab content sections (both Catalog and Recolor tabs)
-    tab_contents = soup.select(".wds-tab__content")
+    tab_contents = TAB_CONTENT_SELECTOR.select(soup)
+
+    hero_suffix = f"({hero.name})"
 
+    links = []
     for tab_content in tab_contents:
-        anchors = tab_content.select(".charcat-wrapper a[href^='/wiki/']")
+        anchors = SKIN_LINK_SELECTOR.select(tab_content)
 
         for a in anchors:
             name = a.get("title", "").strip()
@@ -167,33 +306,31 @@ def fetch_hero_skins(hero: Hero) -> List[HeroSkin]:
             if not name or not href:
                 continue
 
-            href = urljoin(BASE, href)
+            # Drop skins we never keep before paying for their page fetch
+            if "(battlepass)" in name.lower() or "Twitch" in name:
+                continue
 
-            # Follow the href to get the skin id
-            try:
-                skin_soup = get_soup(href)
-                skin_id = extract_skin_id(skin_soup)
-            except Exception as e:
-                print(f"Error fetching skin page for {name}: {e}")
-                skin_id = None
+            links.append((name, urljoin(BASE, href)))
 
-            if f"(battlepass)" in name.lower() or "Twitch" in name:
-                continue
+    # Fetch all skin pages concurrently, results come back in link order
+    futures = [_skin_id_future(link) for link in links]
+    skin_ids = [future.result() for future in futures]
 
-            if skin_id is None:
-                continue
+    for (name, href), skin_id in zip(links, skin_ids):
+        if skin_id is None:
+            continue
 
-            if f"({hero.name})" in name:
-                name = name.replace(f"({hero.name})", "").strip()
+        if hero_suffix in name:
+            name = name.replace(hero_suffix, "").strip()
 
-            skins.append(
-                HeroSkin(
-                    base_hero=hero,
-                    name=name,
-                    url=href,
-                    id=skin_id,
-                )
+        skins.append(
+            HeroSkin(
+                base_hero=hero,
+                name=name,
+                url=href,
+                id=skin_id,
             )
+        )
 
     skins.append(
         HeroSkin(
@@ -209,11 +346,27 @@ def fetch_hero_skins(hero: Hero) -> List[HeroSkin]:
     return skins
 
 
+def serialize_skins(skins: List[HeroSkin]) -> List[dict]:
+    """Flatten skins into the dicts stored in the cache and served by the API"""
+    # The full hero object is left out to avoid circular refs
+    return [
+        {
+            "name": skin.base_hero.name,
+            "id": skin.base_hero.id,
+            "url": skin.url,
+            "skinid": skin.id,
+            "skin_name": skin.name,
+        }
+        for skin in skins
+    ]
+
+
 def get_hero_skins(hero: Hero) -> List[HeroSkin]:
     """Get skins for a hero with caching"""
     cache_key = f"skins_{hero.name}"
     cached = cache.get(cache_key)
     if cached:
+        hero.id = hero.id or cached[0]["id"]
         # Reconstruct HeroSkin objects from cached data
         return [
             HeroSkin(
@@ -225,20 +378,7 @@ def get_hero_skins(hero: Hero) -> List[HeroSkin]:
             for item in cached
         ]
     skins = fetch_hero_skins(hero)
-    # Cache the skins (without the full hero object to avoid circular refs)
-    cache.set(
-        cache_key,
-        [
-            {
-                "name": skin.base_hero.name,
-                "id": skin.base_hero.id,
-                "url": skin.url,
-                "skinid": skin.id,
-                "skin_name": skin.name,
-            }
-            for skin in skins
-        ],
-    )
+    cache.set(cache_key, serialize_skins(skins))
     return skins
 
 
@@ -246,6 +386,8 @@ if __name__ == "__main__":
     heroes = get_heroes()
     print(f"Found {len(heroes)} heroes")
 
+    # Parse in-thread: parse workers would re-run this module as __mp_main__,
+    # opening another HTTP cache session and skin cache each
     for hero in heroes:
         print(f"\n{hero.name}:")
         skins = get_hero_skins(hero)